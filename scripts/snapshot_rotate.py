@@ -3,9 +3,26 @@
 import argparse
 import json
 import os
+import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, UTC
+from functools import lru_cache, partial
 from proxmoxer import ProxmoxAPI
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+_FORMATS = {
+    "hourly": "auto-hourly-%Y%m%d-%H%M",
+    "daily": "auto-daily-%Y%m%d",
+    "weekly": "auto-weekly-%Y%m%d",
+    "monthly": "auto-monthly-%Y%m%d",
+}
+DEFAULT_RETENTION_DAYS = {"hourly": 3, "daily": 14, "weekly": 56, "monthly": 730}
+_SNAP_RE = re.compile(r"^auto-(hourly|daily|weekly|monthly)-(\d{8}(?:-\d{4})?)$")
 
 
 def load_config(path: str) -> dict:
@@ -16,7 +33,7 @@ def load_config(path: str) -> dict:
 def connect_proxmox(config: dict) -> ProxmoxAPI:
     prox = config["proxmox"]
     auth = config["auth"]
-    return ProxmoxAPI(
+    api = ProxmoxAPI(
         prox["host"],
         user=auth["user"],
         token_name=auth["token_name"],
@@ -24,119 +41,233 @@ def connect_proxmox(config: dict) -> ProxmoxAPI:
         verify_ssl=prox.get("verify_ssl", True),
         port=prox.get("port", 8006),
     )
+    # proxmoxer shares one requests.Session across all resources; its default
+    # pool of 10 connections is too small for the worker threads in main().
+    session = api._store["session"]
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+    )
+    session.mount("https://", adapter)
+    if session.headers.get("Connection") == "close":
+        del session.headers["Connection"]
+    return api
 
 
-def tag_snapshot_name(prefix: str) -> str:
-    now = datetime.now(UTC)
-    if prefix == "hourly":
-        return f"auto-hourly-{now:%Y%m%d-%H%M}"
-    if prefix == "daily":
-        return f"auto-daily-{now:%Y%m%d}"
-    if prefix == "weekly":
-        return f"auto-weekly-{now:%Y%m%d}"
-    if prefix == "monthly":
-        return f"auto-monthly-{now:%Y%m%d}"
-    raise ValueError(f"Unknown prefix {prefix}")
+def tag_snapshot_name(prefix: str, now: datetime) -> str:
+    try:
+        return now.strftime(_FORMATS[prefix])
+    except KeyError:
+        raise ValueError(f"Unknown prefix {prefix}") from None
 
 
-def parse_snapshot_timestamp(name: str) -> datetime | None:
+@lru_cache(maxsize=4096)
+def _parse_stamp(cadence: str, stamp: str) -> datetime | None:
+    # _SNAP_RE guarantees the digit layout: YYYYMMDD, plus -HHMM for hourly
+    if (cadence == "hourly") != (len(stamp) == 13):
+        return None
+    hour = minute = 0
+    if len(stamp) == 13:
+        hour, minute = int(stamp[9:11]), int(stamp[11:13])
     try:
-        if not name.startswith("auto-"):
-            return None
-        parts = name.split("-")
-        if len(parts) < 3:
-            return None
-        cadence = parts[1]
-        stamp = "-".join(parts[2:])
-        if cadence == "hourly":
-            return datetime.strptime(stamp, "%Y%m%d-%H%M").replace(tzinfo=UTC)
-        return datetime.strptime(stamp, "%Y%m%d").replace(tzinfo=UTC)
-    except Exception:
+        return datetime(int(stamp[0:4]), int(stamp[4:6]), int(stamp[6:8]), hour, minute, tzinfo=UTC)
+    except ValueError:
         return None
 
 
-def should_create(now: datetime) -> list[str]:
-    cadences = ["hourly"]
-    if now.minute == 0:
-        cadences.append("daily")
-    if now.weekday() == 0 and now.hour == 0 and now.minute == 0:
-        cadences.append("weekly")
-    if now.day == 1 and now.hour == 0 and now.minute == 0:
-        cadences.append("monthly")
-    return cadences
+def parse_snapshot_timestamp(name: str) -> datetime | None:
+    m = _SNAP_RE.match(name)
+    if not m:
+        return None
+    cadence, stamp = m.groups()
+    return _parse_stamp(cadence, stamp)
 
 
-def retention_cutoffs(now: datetime) -> dict:
-    return {
-        "hourly": now - timedelta(days=3),
-        "daily": now - timedelta(days=14),
-        "weekly": now - timedelta(weeks=8),
-        "monthly": now - timedelta(days=730),
-    }
+def enabled_cadences(config: dict) -> frozenset[str]:
+    cadences = frozenset(config.get("rotation", {}).get("cadences", _FORMATS))
+    unknown = cadences - _FORMATS.keys()
+    if unknown:
+        raise ValueError(f"Unknown cadences in config: {', '.join(sorted(unknown))}")
+    return cadences
 
 
-def filter_snapshots(snapshots: list[dict]) -> dict[str, list[dict]]:
-    grouped: dict[str, list[dict]] = {"hourly": [], "daily": [], "weekly": [], "monthly": []}
-    for snap in snapshots:
-        name = snap.get("name", "")
-        if not name.startswith("auto-"):
-            continue
-        parts = name.split("-")
-        if len(parts) < 3:
+def should_create(now: datetime, enabled: frozenset[str]) -> list[str]:
+    cadences = ["hourly"]
+    if not now.minute:
+        cadences.append("daily")
+    if not (now.weekday() or now.hour or now.minute):
+        cadences.append("weekly")
+    if now.day == 1 and not (now.hour or now.minute):
+        cadences.append("monthly")
+    return [cadence for cadence in cadences if cadence in enabled]
+
+
+def retention_cutoffs(now: datetime, days: dict) -> dict:
+    return {cadence: now - timedelta(days=days[cadence]) for cadence in _FORMATS}
+
+
+def build_vm_cutoffs(now: datetime, config: dict) -> dict[str, dict]:
+    retention = config.get("rotation", {}).get("retention", {})
+    policies = {"__default__": retention.get("default", {}), **retention.get("per_vmid", {})}
+    default = {**DEFAULT_RETENTION_DAYS, **policies["__default__"]}
+    result = {}
+    for vmid, overrides in policies.items():
+        unknown = overrides.keys() - _FORMATS.keys()
+        if unknown:
+            raise ValueError(
+                f"Unknown cadences in retention for {vmid}: {', '.join(sorted(unknown))}"
+            )
+        for cadence, days in overrides.items():
+            if isinstance(days, bool) or not isinstance(days, (int, float)) or days < 0:
+                raise ValueError(
+                    f"Invalid {cadence} retention for {vmid}: {days!r} "
+                    "(expected a non-negative number of days)"
+                )
+        result[str(vmid)] = retention_cutoffs(now, {**default, **overrides})
+    return result
+
+
+def guest_api(proxmox: ProxmoxAPI, node: str, vmid: str, kind: str):
+    if kind == "lxc":
+        return proxmox.nodes(node).lxc(vmid)
+    return proxmox.nodes(node).qemu(vmid)
+
+
+def wait_for_task(proxmox: ProxmoxAPI, node: str, upid: str, timeout: float = 300.0) -> str:
+    delay = 0.5
+    deadline = time.monotonic() + timeout
+    while True:
+        status = proxmox.nodes(node).tasks(upid).status.get()
+        if status.get("status") == "stopped":
+            return status.get("exitstatus", "unknown")
+        if time.monotonic() >= deadline:
+            return "timeout"
+        time.sleep(delay)
+        delay = min(delay * 2, 5.0)
+
+
+def expired_snapshots(snapshots: list[dict], cutoffs: dict) -> list[str]:
+    # Pure CPU work, kept separate from the API calls. Parsing is a regex match
+    # plus a cached lookup per name, far cheaper than shipping the lists to a
+    # process pool, so it runs in the calling worker thread.
+    names = [snap["name"] for snap in snapshots if "name" in snap]
+    match = _SNAP_RE.match
+    expired = []
+    for name in names:
+        m = match(name)
+        if m is None:
             continue
-        cadence = parts[1]
-        if cadence in grouped:
-            grouped[cadence].append(snap)
-    return grouped
+        cadence, stamp = m.groups()
+        ts = _parse_stamp(cadence, stamp)
+        if ts is not None and ts < cutoffs[cadence]:
+            expired.append(name)
+    return expired
 
 
 def prune_snapshots(
     proxmox: ProxmoxAPI,
     node: str,
     vmid: str,
-    snapshots: list[dict],
-    cutoff: datetime,
+    expired: list[str],
+    dry_run: bool,
+    kind: str,
+) -> None:
+    if not expired:
+        return
+    if dry_run:
+        for name in expired:
+            print(f"[dry-run] delete {kind} {vmid}@{name}")
+        return
+
+    # Proxmox holds the guest's config lock for the duration of a delete
+    # task, so concurrent deletes on one guest fail with "VM is locked".
+    # Deletes run one at a time per guest; parallelism comes from main()
+    # processing guests concurrently.
+    guest = guest_api(proxmox, node, vmid, kind)
+    for name in expired:
+        upid = guest.snapshot(name).delete()
+        status = wait_for_task(proxmox, node, upid)
+        if status == "OK":
+            print(f"Deleted {kind} {vmid}@{name}")
+        else:
+            print(f"[warn] delete {kind} {vmid}@{name} failed: {status}")
+
+
+def create_snapshot(
+    proxmox: ProxmoxAPI,
+    node: str,
+    vmid: str,
+    name: str,
     dry_run: bool,
     kind: str,
 ) -> None:
-    for snap in snapshots:
-        name = snap.get("name", "")
-        ts = parse_snapshot_timestamp(name)
-        if not ts:
-            continue
-        if ts < cutoff:
-            if dry_run:
-                print(f"[dry-run] delete {kind} {vmid}@{name}")
-            else:
-                if kind == "lxc":
-                    proxmox.nodes(node).lxc(vmid).snapshot(name).delete()
-                else:
-                    proxmox.nodes(node).qemu(vmid).snapshot(name).delete()
-                print(f"Deleted {kind} {vmid}@{name}")
-
-
-def create_snapshot(proxmox: ProxmoxAPI, node: str, vmid: str, cadence: str, dry_run: bool, kind: str) -> None:
-    name = tag_snapshot_name(cadence)
     if dry_run:
         print(f"[dry-run] create {kind} {vmid}@{name}")
         return
-    if kind == "lxc":
-        proxmox.nodes(node).lxc(vmid).snapshot.post(snapname=name)
-    else:
-        proxmox.nodes(node).qemu(vmid).snapshot.post(snapname=name)
+    # Wait for the task so the guest is unlocked before the next create or
+    # the prune that follows; each guest is handled by a single worker.
+    upid = guest_api(proxmox, node, vmid, kind).snapshot.post(snapname=name)
+    status = wait_for_task(proxmox, node, upid)
+    if status != "OK":
+        raise RuntimeError(f"create {kind} {vmid}@{name} failed: {status}")
     print(f"Created {kind} {vmid}@{name}")
 
 
+def write_log(log_handle, lock: threading.Lock, msg: str) -> None:
+    with lock:
+        log_handle.write(msg + "\n")
+
+
+def process_vm(
+    target: tuple[str, str, str],
+    proxmox: ProxmoxAPI,
+    now: datetime,
+    cadences_to_create: list[str],
+    cutoffs_by_vmid: dict[str, dict],
+    dry_run: bool,
+    log_handle,
+    log_lock: threading.Lock,
+) -> None:
+    kind, vmid, node = target
+    cutoffs = cutoffs_by_vmid.get(vmid, cutoffs_by_vmid["__default__"])
+    snapshots = guest_api(proxmox, node, vmid, kind).snapshot.get()
+
+    existing_names = {snap["name"] for snap in snapshots if "name" in snap}
+    expired = expired_snapshots(snapshots, cutoffs)
+
+    failures = []
+    for cadence in cadences_to_create:
+        name = tag_snapshot_name(cadence, now)
+        # A re-run within the same minute/day would only get an error back
+        if name in existing_names:
+            continue
+        try:
+            create_snapshot(proxmox, node, vmid, name, dry_run, kind)
+        except Exception as exc:
+            # Keep going: a guest that cannot snapshot (e.g. full storage)
+            # needs its expired snapshots pruned all the more.
+            failures.append(str(exc))
+            continue
+        write_log(log_handle, log_lock, f"created {kind} {vmid} {cadence}")
+
+    prune_snapshots(proxmox, node, vmid, expired, dry_run, kind)
+    if failures:
+        raise RuntimeError("; ".join(failures))
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Proxmox snapshot rotation")
     parser.add_argument("--config", required=True)
     parser.add_argument("--dry-run", action="store_true")
     parser.add_argument("--log-file", default="./logs/snapshot_rotate.log")
+    parser.add_argument("--workers", type=int, default=16)
     args = parser.parse_args()
 
     log_path = args.log_file
     os.makedirs(os.path.dirname(log_path), exist_ok=True)
     log_handle = open(log_path, "a", encoding="utf-8")
+    log_lock = threading.Lock()
     timestamp = datetime.now(UTC).isoformat()
     log_handle.write(f"\n[{timestamp}] snapshot rotation start\n")
 
@@ -144,43 +275,45 @@ def main() -> int:
     proxmox = connect_proxmox(config)
 
     now = datetime.now(UTC)
-    cadences_to_create = should_create(now)
-    cutoffs = retention_cutoffs(now)
-
-    vms = proxmox.cluster.resources.get(type="vm")
-    for vm in vms:
-        if vm.get("template"):
+    cadences_to_create = should_create(now, enabled_cadences(config))
+    vm_cutoffs = build_vm_cutoffs(now, config)
+
+    # (kind, vmid, node) for every guest to rotate, normalized once so the
+    # workers don't re-probe the resource dicts. cluster/resources carries no
+    # snapshot metadata, so each guest still needs its own snapshot listing
+    # for pruning.
+    targets = []
+    for vm in proxmox.cluster.resources.get(type="vm"):
+        if vm.get("template") or not vm.get("node"):
             continue
         kind = vm.get("type") or "qemu"
         if kind not in ("qemu", "lxc"):
             msg = f"[warn] skipping unsupported type {kind} vmid {vm.get('vmid')}"
             print(msg)
-            log_handle.write(msg + "\n")
-            continue
-        vmid = str(vm.get("vmid"))
-        node = vm.get("node")
-        if not node:
-            continue
-
-        try:
-            if kind == "lxc":
-                snapshots = proxmox.nodes(node).lxc(vmid).snapshot.get()
-            else:
-                snapshots = proxmox.nodes(node).qemu(vmid).snapshot.get()
-        except Exception as exc:
-            msg = f"[warn] skipping {kind} vmid {vmid} on {node}: {exc}"
-            print(msg)
-            log_handle.write(msg + "\n")
+            write_log(log_handle, log_lock, msg)
             continue
-
-        grouped = filter_snapshots(snapshots)
-
-        for cadence in cadences_to_create:
-            create_snapshot(proxmox, node, vmid, cadence, args.dry_run, kind)
-            log_handle.write(f"created {kind} {vmid} {cadence}\n")
-
-        for cadence, snaps in grouped.items():
-            prune_snapshots(proxmox, node, vmid, snaps, cutoffs[cadence], args.dry_run, kind)
+        targets.append((kind, str(vm["vmid"]), vm["node"]))
+
+    worker = partial(
+        process_vm,
+        proxmox=proxmox,
+        now=now,
+        cadences_to_create=cadences_to_create,
+        cutoffs_by_vmid=vm_cutoffs,
+        dry_run=args.dry_run,
+        log_handle=log_handle,
+        log_lock=log_lock,
+    )
+    # Each VM costs several API round-trips, so run them concurrently over the
+    # shared ProxmoxAPI session instead of walking the cluster serially.
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [(target, executor.submit(worker, target)) for target in targets]
+        for (kind, vmid, node), future in futures:
+            exc = future.exception()
+            if exc is not None:
+                msg = f"[warn] {kind} vmid {vmid} on {node}: {exc}"
+                print(msg)
+                write_log(log_handle, log_lock, msg)
 
     log_handle.write(f"[{datetime.now(UTC).isoformat()}] snapshot rotation end\n")
     log_handle.close()
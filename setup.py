@@ -20,6 +20,9 @@ setup(
         "proxmoxer>=2.0.1,<3.0.0",
         "requests>=2.31.0,<3.0.0",
         "pydantic>=2.0.0,<3.0.0",
+        "cachetools>=5.0.0,<6.0.0",
+        "httpx>=0.24.0,<1.0.0",
+        "orjson>=3.9.0,<4.0.0",
     ],
     extras_require={
         "dev": [
@@ -14,6 +14,8 @@ across the MCP server.
 import logging
 from typing import Dict, Any
 from proxmoxer import ProxmoxAPI
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from ..config.models import ProxmoxConfig, AuthConfig
 
 class ProxmoxManager:
@@ -89,6 +91,7 @@ class ProxmoxManager:
         try:
             self.logger.info(f"Connecting to Proxmox host: {self.config['host']}")
             api = ProxmoxAPI(**self.config)
+            self._configure_session(api)
             
             # Test connection
             api.version.get()
@@ -99,6 +102,30 @@ class ProxmoxManager:
             self.logger.error(f"Failed to connect to Proxmox: {e}")
             raise RuntimeError(f"Failed to connect to Proxmox: {e}")
 
+    def _configure_session(self, api: ProxmoxAPI) -> None:
+        """Enlarge the connection pool of the shared HTTP session.
+
+        proxmoxer routes every request through a single requests.Session
+        whose default urllib3 pool holds 10 connections. Once tools issue
+        concurrent calls, surplus connections are discarded and re-opened
+        (paying a fresh TCP+TLS handshake each time). Mounting a larger
+        adapter keeps them alive and adds retries for gateway errors
+        (502/503/504). Plain 500s are not retried: Proxmox uses them for
+        ordinary API errors, whose message proxmoxer must see.
+
+        Args:
+            api: Freshly constructed ProxmoxAPI instance
+        """
+        session = api._store["session"]
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=64,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+        )
+        session.mount("https://", adapter)
+        if session.headers.get("Connection") == "close":
+            del session.headers["Connection"]
+
     def get_api(self) -> ProxmoxAPI:
         """Get the initialized Proxmox API instance.
         
@@ -66,9 +66,10 @@ class ProxmoxMCPServer:
         self.proxmox_manager = ProxmoxManager(self.config.proxmox, self.config.auth)
         self.proxmox = self.proxmox_manager.get_api()
         
-        # Initialize tools
+        # Initialize tools once; they hold caches, pooled connections and
+        # per-VM locks that must survive across MCP tool calls
         self.node_tools = NodeTools(self.proxmox)
-        self.vm_tools = VMTools(self.proxmox)
+        self.vm_tools = VMTools(self.proxmox, self.config.proxmox, self.config.auth)
         self.storage_tools = StorageTools(self.proxmox)
         self.cluster_tools = ClusterTools(self.proxmox)
         
@@ -114,68 +115,68 @@ class ProxmoxMCPServer:
             return await self.vm_tools.execute_command(node, vmid, command)
 
         @self.mcp.tool(description=VM_SNAPSHOT_LIST_DESC)
-        def list_vm_snapshots(
+        async def list_vm_snapshots(
             node: Annotated[str, Field(description="Host node name (e.g. 'pve1', 'proxmox-node2')")],
             vmid: Annotated[str, Field(description="VM ID number (e.g. '100', '101')")]
         ):
-            return self.vm_tools.list_snapshots(node, vmid)
+            return await self.vm_tools.list_snapshots(node, vmid)
 
         @self.mcp.tool(description=VM_SNAPSHOT_CREATE_DESC)
-        def create_vm_snapshot(
+        async def create_vm_snapshot(
             node: Annotated[str, Field(description="Host node name (e.g. 'pve1', 'proxmox-node2')")],
             vmid: Annotated[str, Field(description="VM ID number (e.g. '100', '101')")],
             name: Annotated[str, Field(description="Snapshot name")],
             include_memory: Annotated[bool, Field(description="Include VM memory state", default=False)] = False,
             description: Annotated[Optional[str], Field(description="Optional description", default=None)] = None,
         ):
-            return self.vm_tools.create_snapshot(node, vmid, name, include_memory, description)
+            return await self.vm_tools.create_snapshot(node, vmid, name, include_memory, description)
 
         @self.mcp.tool(description=VM_SNAPSHOT_ROLLBACK_DESC)
-        def rollback_vm_snapshot(
+        async def rollback_vm_snapshot(
             node: Annotated[str, Field(description="Host node name (e.g. 'pve1', 'proxmox-node2')")],
             vmid: Annotated[str, Field(description="VM ID number (e.g. '100', '101')")],
             name: Annotated[str, Field(description="Snapshot name")],
         ):
-            return self.vm_tools.rollback_snapshot(node, vmid, name)
+            return await self.vm_tools.rollback_snapshot(node, vmid, name)
 
         @self.mcp.tool(description=VM_SNAPSHOT_DELETE_DESC)
-        def delete_vm_snapshot(
+        async def delete_vm_snapshot(
             node: Annotated[str, Field(description="Host node name (e.g. 'pve1', 'proxmox-node2')")],
             vmid: Annotated[str, Field(description="VM ID number (e.g. '100', '101')")],
             name: Annotated[str, Field(description="Snapshot name")],
         ):
-            return self.vm_tools.delete_snapshot(node, vmid, name)
+            return await self.vm_tools.delete_snapshot(node, vmid, name)
 
         @self.mcp.tool(description=LXC_SNAPSHOT_LIST_DESC)
-        def list_lxc_snapshots(
+        async def list_lxc_snapshots(
             node: Annotated[str, Field(description="Host node name (e.g. 'pve1', 'proxmox-node2')")],
             vmid: Annotated[str, Field(description="Container ID number (e.g. '100')")],
         ):
-            return self.vm_tools.list_lxc_snapshots(node, vmid)
+            return await self.vm_tools.list_lxc_snapshots(node, vmid)
 
         @self.mcp.tool(description=LXC_SNAPSHOT_CREATE_DESC)
-        def create_lxc_snapshot(
+        async def create_lxc_snapshot(
             node: Annotated[str, Field(description="Host node name (e.g. 'pve1', 'proxmox-node2')")],
             vmid: Annotated[str, Field(description="Container ID number (e.g. '100')")],
             name: Annotated[str, Field(description="Snapshot name")],
         ):
-            return self.vm_tools.create_lxc_snapshot(node, vmid, name)
+            return await self.vm_tools.create_lxc_snapshot(node, vmid, name)
 
         @self.mcp.tool(description=LXC_SNAPSHOT_ROLLBACK_DESC)
-        def rollback_lxc_snapshot(
+        async def rollback_lxc_snapshot(
             node: Annotated[str, Field(description="Host node name (e.g. 'pve1', 'proxmox-node2')")],
             vmid: Annotated[str, Field(description="Container ID number (e.g. '100')")],
             name: Annotated[str, Field(description="Snapshot name")],
         ):
-            return self.vm_tools.rollback_lxc_snapshot(node, vmid, name)
+            return await self.vm_tools.rollback_lxc_snapshot(node, vmid, name)
 
         @self.mcp.tool(description=LXC_SNAPSHOT_DELETE_DESC)
-        def delete_lxc_snapshot(
+        async def delete_lxc_snapshot(
             node: Annotated[str, Field(description="Host node name (e.g. 'pve1', 'proxmox-node2')")],
             vmid: Annotated[str, Field(description="Container ID number (e.g. '100')")],
             name: Annotated[str, Field(description="Snapshot name")],
         ):
-            return self.vm_tools.delete_lxc_snapshot(node, vmid, name)
+            return await self.vm_tools.delete_lxc_snapshot(node, vmid, name)
 
         # Storage tools
         @self.mcp.tool(description=GET_STORAGE_DESC)
@@ -187,6 +188,13 @@ class ProxmoxMCPServer:
         def get_cluster_status():
             return self.cluster_tools.get_cluster_status()
 
+    async def _run(self) -> None:
+        """Run the stdio MCP server, closing pooled connections on exit."""
+        try:
+            await self.mcp.run_stdio_async()
+        finally:
+            await self.vm_tools.aclose()
+
     def start(self) -> None:
         """Start the MCP server.
         
@@ -209,7 +217,7 @@ class ProxmoxMCPServer:
 
         try:
             self.logger.info("Starting MCP server...")
-            anyio.run(self.mcp.run_stdio_async)
+            anyio.run(self._run)
         except Exception as e:
             self.logger.error(f"Server error: {e}")
             sys.exit(1)
@@ -3,19 +3,158 @@ Base classes and utilities for Proxmox MCP tools.
 
 This module provides the foundation for all Proxmox MCP tools, including:
 - Base tool class with common functionality
+- Asynchronous HTTP client for the Proxmox REST API
 - Response formatting utilities
+- Short-lived caching of read-only API listings
 - Error handling mechanisms
 - Logging setup
 
 All tool implementations inherit from the ProxmoxTool base class to ensure
 consistent behavior and error handling across the MCP server.
 """
+import asyncio
 import logging
-from typing import Any, Dict, List, Optional, Union
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import httpx
+import orjson
+import requests
+from cachetools import LRUCache, TTLCache
 from mcp.types import TextContent as Content
 from proxmoxer import ProxmoxAPI
+from ..config.models import AuthConfig, ProxmoxConfig
 from ..formatting import ProxmoxTemplates
 
+# Cache lifetimes (seconds) for read-only API listings
+CACHE_TTL_SHORT = 5    # runtime status and memory usage
+CACHE_TTL_NORMAL = 30  # configuration and snapshot lists
+CACHE_TTL_LONG = 60    # cluster node membership
+CACHE_MAXSIZE = 256
+# Oldest result (seconds) the stale fallback will serve during an outage
+CACHE_STALE_MAX_AGE = 900
+
+# Failures that mean Proxmox could not be reached, as opposed to an answer
+# from Proxmox: connection and timeout errors, and gateway statuses seen
+# while a node or its proxy restarts. requests raises RetryError once the
+# session's retries on 502/503/504 are exhausted.
+_OUTAGE_ERRORS = (
+    httpx.TransportError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.RetryError,
+)
+_OUTAGE_STATUSES = frozenset({502, 503, 504})
+
+class ProxmoxAPIError(RuntimeError):
+    """Error status returned by the Proxmox REST API."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+
+def _is_outage(error: Exception) -> bool:
+    """Return True if error means the API was unreachable rather than refusing."""
+    if isinstance(error, _OUTAGE_ERRORS):
+        return True
+    # ProxmoxAPIError and proxmoxer's ResourceException both carry the status
+    return getattr(error, "status_code", None) in _OUTAGE_STATUSES
+
+class ProxmoxAsyncClient:
+    """Thin asynchronous client for the Proxmox REST API.
+
+    proxmoxer is synchronous, so every call made through it blocks the MCP
+    event loop. This client issues requests over a shared httpx.AsyncClient
+    instead, letting concurrent tool calls overlap their round-trips on a
+    pool of keep-alive connections.
+
+    Paths are relative to /api2/json, e.g. "/nodes/pve1/qemu/100/snapshot".
+    Responses are unwrapped to their "data" member.
+    """
+
+    def __init__(self, proxmox_config: ProxmoxConfig, auth_config: AuthConfig):
+        """Initialize the client.
+
+        Args:
+            proxmox_config: Proxmox connection configuration
+            auth_config: Token authentication configuration
+        """
+        service = proxmox_config.service.upper()
+        separator = ":" if service == "PBS" else "="
+        token = f"{auth_config.user}!{auth_config.token_name}{separator}{auth_config.token_value}"
+        self._client = httpx.AsyncClient(
+            base_url=f"https://{proxmox_config.host}:{proxmox_config.port}/api2/json",
+            headers={"Authorization": f"{service}APIToken={token}"},
+            verify=proxmox_config.verify_ssl,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=30,
+        )
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> Any:
+        """Send a request and return the "data" member of the response.
+
+        Args:
+            method: HTTP method
+            path: API path relative to /api2/json
+            **kwargs: Passed through to httpx (params, data, ...)
+
+        Returns:
+            Decoded "data" member of the JSON response
+
+        Raises:
+            ProxmoxAPIError: If Proxmox answers with an error status
+        """
+        response = await self._client.request(method, path, **kwargs)
+        if response.is_error:
+            detail = response.reason_phrase
+            try:
+                errors = response.json().get("errors")
+            except ValueError:
+                errors = None
+            if errors:
+                detail = f"{detail}: {errors}"
+            raise ProxmoxAPIError(response.status_code, detail)
+        return response.json().get("data")
+
+    async def get(self, path: str, **params: Any) -> Any:
+        return await self.request("GET", path, params=params)
+
+    async def post(self, path: str, **data: Any) -> Any:
+        return await self.request("POST", path, data=data)
+
+    async def delete(self, path: str, **params: Any) -> Any:
+        return await self.request("DELETE", path, params=params)
+
+    async def wait_for_task(self, node: str, upid: str, timeout: float = 300.0) -> str:
+        """Poll a Proxmox task until it stops.
+
+        Snapshot create/rollback/delete return a task UPID immediately and
+        keep the guest locked while the task runs in the background.
+
+        Args:
+            node: Node the task runs on
+            upid: Task ID returned by the submitting request
+            timeout: Seconds to wait; the task itself keeps running afterwards
+
+        Returns:
+            The task's exit status ("OK" on success), or "timeout"
+        """
+        delay = 0.5
+        deadline = time.monotonic() + timeout
+        while True:
+            status = await self.get(f"/nodes/{node}/tasks/{upid}/status")
+            if status.get("status") == "stopped":
+                return status.get("exitstatus", "unknown")
+            if time.monotonic() >= deadline:
+                return "timeout"
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    async def aclose(self) -> None:
+        """Close all pooled connections."""
+        await self._client.aclose()
+
 class ProxmoxTool:
     """Base class for Proxmox MCP tools.
     
@@ -23,12 +162,16 @@ class ProxmoxTool:
     - Proxmox API access
     - Standardized logging
     - Response formatting
+    - TTL caching of repeated reads, with stale fallback on API errors
     - Error handling
     
     All tool classes should inherit from this base class to ensure consistent
     behavior and error handling across the MCP server.
     """
 
+    # Serve the last known result of a cached read when the API call fails
+    cache_fallback_enabled = True
+
     def __init__(self, proxmox_api: ProxmoxAPI):
         """Initialize the tool.
 
@@ -37,6 +180,143 @@ class ProxmoxTool:
         """
         self.proxmox = proxmox_api
         self.logger = logging.getLogger(f"proxmox-mcp.{self.__class__.__name__.lower()}")
+        self._caches: Dict[int, TTLCache] = {}
+        self._stale_cache: LRUCache = LRUCache(maxsize=CACHE_MAXSIZE)
+        self._cache_lock = threading.Lock()
+
+    def _cached(
+        self,
+        key: Tuple[str, Tuple],
+        fn: Callable[[], Any],
+        ttl: int = CACHE_TTL_NORMAL,
+        fallback: bool = True,
+    ) -> Any:
+        """Return a cached API result, calling fn() on a miss.
+
+        LLM clients tend to repeat the same listing calls many times per
+        session while the underlying data changes on the order of minutes.
+        Results are kept in one TTLCache per lifetime so volatile data
+        (status) expires sooner than slow-moving data (node list).
+
+        If fn() fails because Proxmox is unreachable (see _is_outage) and a
+        result for key no older than CACHE_STALE_MAX_AGE is known, that
+        result is returned instead, marked with "_stale" and "_as_of" (see
+        _stale_as_of), so a transient outage degrades to slightly old data
+        rather than a tool error. Error answers from Proxmox itself, such as
+        a missing guest or a revoked token, are always raised.
+
+        Args:
+            key: (endpoint, params) tuple identifying the request,
+                 e.g. ("nodes/pve1/qemu/100/snapshot", ())
+            fn: Zero-argument callable performing the API request
+            ttl: Lifetime in seconds, one of the CACHE_TTL_* constants
+            fallback: Whether a stale result may be served on failure
+
+        Returns:
+            The cached or freshly fetched API result
+        """
+        with self._cache_lock:
+            cache = self._cache_for(ttl)
+            if key in cache:
+                return cache[key]
+        try:
+            value = fn()
+        except Exception as e:
+            return self._stale_or_raise(key, e, fallback)
+        self._store(cache, key, value)
+        return value
+
+    async def _acached(
+        self,
+        key: Tuple[str, Tuple],
+        fn: Callable[[], Awaitable[Any]],
+        ttl: int = CACHE_TTL_NORMAL,
+        fallback: bool = True,
+    ) -> Any:
+        """Coroutine counterpart of _cached for async API calls.
+
+        Args:
+            key: (endpoint, params) tuple identifying the request
+            fn: Zero-argument coroutine function performing the API request
+            ttl: Lifetime in seconds, one of the CACHE_TTL_* constants
+            fallback: Whether a stale result may be served on failure
+
+        Returns:
+            The cached or freshly fetched API result
+        """
+        with self._cache_lock:
+            cache = self._cache_for(ttl)
+            if key in cache:
+                return cache[key]
+        try:
+            value = await fn()
+        except Exception as e:
+            return self._stale_or_raise(key, e, fallback)
+        self._store(cache, key, value)
+        return value
+
+    def _store(self, cache: TTLCache, key: Tuple[str, Tuple], value: Any) -> None:
+        """Record a fresh result in the TTL cache and the stale fallback."""
+        with self._cache_lock:
+            cache[key] = value
+            self._stale_cache[key] = (value, time.time())
+
+    def _stale_or_raise(self, key: Tuple[str, Tuple], error: Exception, fallback: bool) -> Any:
+        """Return the last known result for key, or re-raise error.
+
+        error is re-raised unless it is an outage and a result younger than
+        CACHE_STALE_MAX_AGE is known. Lists of dicts and dicts are returned
+        as annotated copies carrying "_stale": True and "_as_of" (ISO
+        timestamp of the original fetch).
+        """
+        with self._cache_lock:
+            entry = self._stale_cache.get(key)
+        if not (fallback and self.cache_fallback_enabled and entry is not None):
+            raise error
+        value, fetched_at = entry
+        if not _is_outage(error) or time.time() - fetched_at > CACHE_STALE_MAX_AGE:
+            raise error
+        as_of = datetime.fromtimestamp(fetched_at).isoformat(timespec="seconds")
+        self.logger.warning(f"Serving cached {key[0]} from {as_of}: {error}")
+        marker = {"_stale": True, "_as_of": as_of}
+        if isinstance(value, dict):
+            return {**value, **marker}
+        if isinstance(value, list):
+            return [{**item, **marker} if isinstance(item, dict) else item for item in value]
+        return value
+
+    @staticmethod
+    def _stale_as_of(data: Any) -> Optional[str]:
+        """Return the "_as_of" timestamp if data came from the stale fallback."""
+        if isinstance(data, list):
+            data = data[0] if data else None
+        if isinstance(data, dict) and data.get("_stale"):
+            return data.get("_as_of")
+        return None
+
+    def _cache_for(self, ttl: int) -> TTLCache:
+        """Return the cache holding entries with the given lifetime.
+
+        Must be called with _cache_lock held.
+        """
+        cache = self._caches.get(ttl)
+        if cache is None:
+            cache = self._caches[ttl] = TTLCache(maxsize=CACHE_MAXSIZE, ttl=ttl)
+        return cache
+
+    def _invalidate(self, prefix: str) -> None:
+        """Drop every cached entry whose endpoint starts with prefix.
+
+        Mutating operations call this so follow-up reads see their effect,
+        e.g. _invalidate("nodes/pve1/qemu/100/") after creating a snapshot.
+
+        Args:
+            prefix: Endpoint prefix to invalidate
+        """
+        with self._cache_lock:
+            for cache in (*self._caches.values(), self._stale_cache):
+                for key in [k for k in cache.keys() if k[0].startswith(prefix)]:
+                    cache.pop(key, None)
 
     def _format_response(self, data: Any, resource_type: Optional[str] = None) -> List[Content]:
         """Format response data into MCP content using templates.
@@ -72,8 +352,7 @@ class ProxmoxTool:
             formatted = ProxmoxTemplates.cluster_status(data)
         else:
             # Fallback to JSON formatting for unknown types
-            import json
-            formatted = json.dumps(data, indent=2)
+            formatted = orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
 
         return [Content(type="text", text=formatted)]
 
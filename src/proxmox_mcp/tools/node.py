@@ -14,7 +14,7 @@ with fallback mechanisms for partial data availability.
 """
 from typing import List
 from mcp.types import TextContent as Content
-from .base import ProxmoxTool
+from .base import ProxmoxTool, CACHE_TTL_LONG
 from .definitions import GET_NODES_DESC, GET_NODE_STATUS_DESC
 
 class NodeTools(ProxmoxTool):
@@ -59,7 +59,10 @@ class NodeTools(ProxmoxTool):
             RuntimeError: If the cluster-wide node query fails
         """
         try:
-            result = self.proxmox.nodes.get()
+            # Node online/offline state must not be served from a stale copy
+            result = self._cached(
+                ("nodes", ()), self.proxmox.nodes.get, CACHE_TTL_LONG, fallback=False
+            )
             nodes = []
             
             # Get detailed info for each node
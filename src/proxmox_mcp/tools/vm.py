@@ -9,16 +9,30 @@ This module provides tools for managing and interacting with Proxmox VMs:
   * Node placement
 - Executing commands within VMs via QEMU guest agent
 - Handling VM console operations
+- Managing VM and LXC snapshots over the async Proxmox client
 
 The tools implement fallback mechanisms for scenarios where
 detailed VM information might be temporarily unavailable.
 """
-from typing import List, Optional
+import asyncio
+from collections import defaultdict
+from functools import cached_property, lru_cache
+from typing import Any, Awaitable, Callable, DefaultDict, List, Optional, Set
 from datetime import datetime
 from mcp.types import TextContent as Content
-from .base import ProxmoxTool
+from .base import ProxmoxAsyncClient, ProxmoxTool, CACHE_TTL_SHORT, CACHE_TTL_NORMAL
 from .definitions import GET_VMS_DESC, EXECUTE_VM_COMMAND_DESC
 from .console.manager import VMConsoleManager
+from ..config.models import AuthConfig, ProxmoxConfig
+from ..formatting import ProxmoxFormatters
+
+_format_command_output = ProxmoxFormatters.format_command_output
+_fromtimestamp = datetime.fromtimestamp
+
+@lru_cache(maxsize=1024)
+def _iso(snaptime: Optional[int]) -> str:
+    """Format a snapshot timestamp; repeated listings reuse the result."""
+    return _fromtimestamp(snaptime).isoformat() if snaptime else "unknown"
 
 class VMTools(ProxmoxTool):
     """Tools for managing Proxmox VMs.
@@ -34,14 +48,110 @@ class VMTools(ProxmoxTool):
     with QEMU guest agent for VM command execution.
     """
 
-    def __init__(self, proxmox_api):
+    def __init__(self, proxmox_api, proxmox_config: ProxmoxConfig, auth_config: AuthConfig):
         """Initialize VM tools.
 
+        Construction is cheap: the async HTTP client and console manager
+        are created on first use. The server keeps a single instance so
+        the cache, connection pool and per-VM locks outlive each call.
+
         Args:
             proxmox_api: Initialized ProxmoxAPI instance
+            proxmox_config: Proxmox connection configuration for the async client
+            auth_config: Authentication configuration for the async client
         """
         super().__init__(proxmox_api)
-        self.console_manager = VMConsoleManager(proxmox_api)
+        self._proxmox_config = proxmox_config
+        self._auth_config = auth_config
+        # Mutating snapshot calls on the same guest are queued client-side
+        # until the previous task finishes; racing them makes Proxmox reject
+        # them with "VM is locked". Lookups happen on the event loop thread
+        # without awaiting, so the defaultdict itself needs no extra guard.
+        self._vm_locks: DefaultDict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # Waiters still holding a guest's lock for a task that outlived its call
+        self._pending_tasks: Set[asyncio.Task] = set()
+
+    @cached_property
+    def _client(self) -> ProxmoxAsyncClient:
+        """Async client used for snapshot operations."""
+        return ProxmoxAsyncClient(self._proxmox_config, self._auth_config)
+
+    @cached_property
+    def console_manager(self) -> VMConsoleManager:
+        """Console manager used for guest agent command execution."""
+        return VMConsoleManager(self.proxmox)
+
+    async def _run_task(
+        self, node: str, vmid: str, submit: Callable[[], Awaitable[Any]]
+    ) -> Optional[str]:
+        """Submit a snapshot task and hold the guest's lock until it stops.
+
+        A task may outlive the wait in ProxmoxAsyncClient.wait_for_task, e.g.
+        a snapshot with vmstate of a VM with a lot of memory. The lock is
+        then handed to a background waiter that keeps polling and releases
+        it once the task stops, so queued calls still do not race it.
+
+        Args:
+            node: Host node name
+            vmid: Guest ID whose lock to hold
+            submit: Coroutine function issuing the request; returns the task UPID
+
+        Returns:
+            None once the task has finished, or its UPID if it is still running
+
+        Raises:
+            RuntimeError: If the task fails
+        """
+        lock = self._vm_locks[str(vmid)]
+        await lock.acquire()
+        try:
+            upid = await submit()
+            status = await self._client.wait_for_task(node, upid)
+        except BaseException:
+            lock.release()
+            raise
+        if status == "timeout":
+            waiter = asyncio.create_task(self._wait_in_background(node, upid))
+            self._pending_tasks.add(waiter)
+            waiter.add_done_callback(self._pending_tasks.discard)
+            # A callback rather than a finally block: a waiter cancelled
+            # before its first step never runs its body.
+            waiter.add_done_callback(lambda _: lock.release())
+            return upid
+        lock.release()
+        if status != "OK":
+            raise RuntimeError(f"Task {upid} ended with status: {status}")
+        return None
+
+    async def _wait_in_background(self, node: str, upid: str) -> None:
+        """Keep polling a task that outlived its call until it stops."""
+        try:
+            status = "timeout"
+            while status == "timeout":
+                status = await self._client.wait_for_task(node, upid)
+            if status != "OK":
+                self.logger.warning(f"Task {upid} ended with status: {status}")
+        except Exception as e:
+            self.logger.warning(f"Stopped waiting for task {upid}: {e}")
+
+    @staticmethod
+    def _task_reply(text: str, pending_upid: Optional[str]) -> List[Content]:
+        """Build the reply for a snapshot task, noting one that is still running."""
+        if pending_upid:
+            text = (
+                f"Task {pending_upid} is still running; further snapshot operations "
+                f"on this guest will wait for it. Requested: {text}"
+            )
+        return [Content(type="text", text=text)]
+
+    async def aclose(self) -> None:
+        """Stop background task waiters and close the async HTTP client."""
+        for waiter in list(self._pending_tasks):
+            waiter.cancel()
+        await asyncio.gather(*self._pending_tasks, return_exceptions=True)
+        client = self.__dict__.pop("_client", None)
+        if client is not None:
+            await client.aclose()
 
     def get_vms(self) -> List[Content]:
         """List all virtual machines across the cluster with detailed status.
@@ -54,8 +164,8 @@ class VMTools(ProxmoxTool):
           * Memory allocation and usage
         - Node placement
         
-        Implements a fallback mechanism that returns basic information
-        if detailed configuration retrieval fails for any VM.
+        All fields come from a single cluster-wide resources query, so
+        the cost does not grow with the number of VMs.
 
         Returns:
             List of Content objects containing formatted VM information:
@@ -76,57 +186,58 @@ class VMTools(ProxmoxTool):
         """
         try:
             result = []
-            for node in self.proxmox.nodes.get():
-                node_name = node["node"]
-                vms = self.proxmox.nodes(node_name).qemu.get()
-                for vm in vms:
-                    vmid = vm["vmid"]
-                    # Get VM config for CPU cores
-                    try:
-                        config = self.proxmox.nodes(node_name).qemu(vmid).config.get()
-                        result.append({
-                            "vmid": vmid,
-                            "name": vm["name"],
-                            "status": vm["status"],
-                            "node": node_name,
-                            "cpus": config.get("cores", "N/A"),
-                            "memory": {
-                                "used": vm.get("mem", 0),
-                                "total": vm.get("maxmem", 0)
-                            }
-                        })
-                    except Exception:
-                        # Fallback if can't get config
-                        result.append({
-                            "vmid": vmid,
-                            "name": vm["name"],
-                            "status": vm["status"],
-                            "node": node_name,
-                            "cpus": "N/A",
-                            "memory": {
-                                "used": vm.get("mem", 0),
-                                "total": vm.get("maxmem", 0)
-                            }
-                        })
-            return self._format_response(result, "vms")
+            vms = self._cached(
+                ("cluster/resources", (("type", "vm"),)),
+                lambda: self.proxmox.cluster.resources.get(type="vm"),
+                CACHE_TTL_SHORT,
+            )
+            for vm in vms:
+                # cluster/resources also lists LXC containers
+                if vm.get("type", "qemu") != "qemu":
+                    continue
+                result.append({
+                    "vmid": vm["vmid"],
+                    "name": vm.get("name", f"VM {vm['vmid']}"),
+                    "status": vm.get("status", "unknown"),
+                    "node": vm.get("node"),
+                    "cpus": vm.get("maxcpu", "N/A"),
+                    "memory": {
+                        "used": vm.get("mem", 0),
+                        "total": vm.get("maxmem", 0)
+                    }
+                })
+            content = self._format_response(result, "vms")
+            as_of = self._stale_as_of(vms)
+            if as_of:
+                content.append(Content(
+                    type="text",
+                    text=f"Note: Proxmox API unavailable, showing cached data from {as_of}"
+                ))
+            return content
         except Exception as e:
             self._handle_error("get VMs", e)
 
-    def list_snapshots(self, node: str, vmid: str) -> List[Content]:
+    async def list_snapshots(self, node: str, vmid: str) -> List[Content]:
         """List snapshots for a VM."""
         try:
-            snapshots = self.proxmox.nodes(node).qemu(vmid).snapshot.get()
-            lines = [f"Snapshots for VM {vmid} on {node}:"]
-            for snap in snapshots:
-                name = snap.get("name", "unknown")
-                snaptime = snap.get("snaptime")
-                created = datetime.fromtimestamp(snaptime).isoformat() if snaptime else "unknown"
-                lines.append(f"- {name} (created: {created})")
-            return [Content(type="text", text="\n".join(lines))]
+            snapshots = await self._acached(
+                (f"nodes/{node}/qemu/{vmid}/snapshot", ()),
+                lambda: self._client.get(f"/nodes/{node}/qemu/{vmid}/snapshot"),
+                CACHE_TTL_NORMAL,
+            )
+            header = f"Snapshots for VM {vmid} on {node}:"
+            as_of = self._stale_as_of(snapshots)
+            if as_of:
+                header += f"\n(Proxmox API unavailable, showing cached data from {as_of})"
+            lines = (
+                f"- {snap.get('name', 'unknown')} (created: {_iso(snap.get('snaptime'))})"
+                for snap in snapshots
+            )
+            return [Content(type="text", text="\n".join((header, *lines)))]
         except Exception as e:
             self._handle_error(f"list snapshots for VM {vmid}", e)
 
-    def create_snapshot(
+    async def create_snapshot(
         self,
         node: str,
         vmid: str,
@@ -141,62 +252,80 @@ class VMTools(ProxmoxTool):
                 payload["description"] = description
             if include_memory:
                 payload["vmstate"] = 1
-            self.proxmox.nodes(node).qemu(vmid).snapshot.post(**payload)
-            return [Content(type="text", text=f"Snapshot created: {name} for VM {vmid} on {node}")]
+            path = f"/nodes/{node}/qemu/{vmid}/snapshot"
+            upid = await self._run_task(node, vmid, lambda: self._client.post(path, **payload))
+            self._invalidate(f"nodes/{node}/qemu/{vmid}/")
+            return self._task_reply(f"Snapshot created: {name} for VM {vmid} on {node}", upid)
         except Exception as e:
             self._handle_error(f"create snapshot {name} for VM {vmid}", e)
 
-    def rollback_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
+    async def rollback_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
         """Rollback a VM snapshot."""
         try:
-            self.proxmox.nodes(node).qemu(vmid).snapshot(name).rollback.post()
-            return [Content(type="text", text=f"Snapshot rollback started: {name} for VM {vmid} on {node}")]
+            path = f"/nodes/{node}/qemu/{vmid}/snapshot/{name}/rollback"
+            upid = await self._run_task(node, vmid, lambda: self._client.post(path))
+            self._invalidate(f"nodes/{node}/qemu/{vmid}/")
+            return self._task_reply(f"Snapshot rolled back: {name} for VM {vmid} on {node}", upid)
         except Exception as e:
             self._handle_error(f"rollback snapshot {name} for VM {vmid}", e)
 
-    def delete_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
+    async def delete_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
         """Delete a VM snapshot."""
         try:
-            self.proxmox.nodes(node).qemu(vmid).snapshot(name).delete()
-            return [Content(type="text", text=f"Snapshot deleted: {name} for VM {vmid} on {node}")]
+            path = f"/nodes/{node}/qemu/{vmid}/snapshot/{name}"
+            upid = await self._run_task(node, vmid, lambda: self._client.delete(path))
+            self._invalidate(f"nodes/{node}/qemu/{vmid}/")
+            return self._task_reply(f"Snapshot deleted: {name} for VM {vmid} on {node}", upid)
         except Exception as e:
             self._handle_error(f"delete snapshot {name} for VM {vmid}", e)
 
-    def list_lxc_snapshots(self, node: str, vmid: str) -> List[Content]:
+    async def list_lxc_snapshots(self, node: str, vmid: str) -> List[Content]:
         """List snapshots for an LXC container."""
         try:
-            snapshots = self.proxmox.nodes(node).lxc(vmid).snapshot.get()
-            lines = [f"Snapshots for LXC {vmid} on {node}:"]
-            for snap in snapshots:
-                name = snap.get("name", "unknown")
-                snaptime = snap.get("snaptime")
-                created = datetime.fromtimestamp(snaptime).isoformat() if snaptime else "unknown"
-                lines.append(f"- {name} (created: {created})")
-            return [Content(type="text", text="\n".join(lines))]
+            snapshots = await self._acached(
+                (f"nodes/{node}/lxc/{vmid}/snapshot", ()),
+                lambda: self._client.get(f"/nodes/{node}/lxc/{vmid}/snapshot"),
+                CACHE_TTL_NORMAL,
+            )
+            header = f"Snapshots for LXC {vmid} on {node}:"
+            as_of = self._stale_as_of(snapshots)
+            if as_of:
+                header += f"\n(Proxmox API unavailable, showing cached data from {as_of})"
+            lines = (
+                f"- {snap.get('name', 'unknown')} (created: {_iso(snap.get('snaptime'))})"
+                for snap in snapshots
+            )
+            return [Content(type="text", text="\n".join((header, *lines)))]
         except Exception as e:
             self._handle_error(f"list snapshots for LXC {vmid}", e)
 
-    def create_lxc_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
+    async def create_lxc_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
         """Create an LXC snapshot."""
         try:
-            self.proxmox.nodes(node).lxc(vmid).snapshot.post(snapname=name)
-            return [Content(type="text", text=f"Snapshot created: {name} for LXC {vmid} on {node}")]
+            path = f"/nodes/{node}/lxc/{vmid}/snapshot"
+            upid = await self._run_task(node, vmid, lambda: self._client.post(path, snapname=name))
+            self._invalidate(f"nodes/{node}/lxc/{vmid}/")
+            return self._task_reply(f"Snapshot created: {name} for LXC {vmid} on {node}", upid)
         except Exception as e:
             self._handle_error(f"create snapshot {name} for LXC {vmid}", e)
 
-    def rollback_lxc_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
+    async def rollback_lxc_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
         """Rollback an LXC snapshot."""
         try:
-            self.proxmox.nodes(node).lxc(vmid).snapshot(name).rollback.post()
-            return [Content(type="text", text=f"Snapshot rollback started: {name} for LXC {vmid} on {node}")]
+            path = f"/nodes/{node}/lxc/{vmid}/snapshot/{name}/rollback"
+            upid = await self._run_task(node, vmid, lambda: self._client.post(path))
+            self._invalidate(f"nodes/{node}/lxc/{vmid}/")
+            return self._task_reply(f"Snapshot rolled back: {name} for LXC {vmid} on {node}", upid)
         except Exception as e:
             self._handle_error(f"rollback snapshot {name} for LXC {vmid}", e)
 
-    def delete_lxc_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
+    async def delete_lxc_snapshot(self, node: str, vmid: str, name: str) -> List[Content]:
         """Delete an LXC snapshot."""
         try:
-            self.proxmox.nodes(node).lxc(vmid).snapshot(name).delete()
-            return [Content(type="text", text=f"Snapshot deleted: {name} for LXC {vmid} on {node}")]
+            path = f"/nodes/{node}/lxc/{vmid}/snapshot/{name}"
+            upid = await self._run_task(node, vmid, lambda: self._client.delete(path))
+            self._invalidate(f"nodes/{node}/lxc/{vmid}/")
+            return self._task_reply(f"Snapshot deleted: {name} for LXC {vmid} on {node}", upid)
         except Exception as e:
             self._handle_error(f"delete snapshot {name} for LXC {vmid}", e)
 
@@ -228,9 +357,7 @@ class VMTools(ProxmoxTool):
         """
         try:
             result = await self.console_manager.execute_command(node, vmid, command)
-            # Use the command output formatter from ProxmoxFormatters
-            from ..formatting import ProxmoxFormatters
-            formatted = ProxmoxFormatters.format_command_output(
+            formatted = _format_command_output(
                 success=result["success"],
                 command=command,
                 output=result["output"],
@@ -97,10 +97,10 @@ async def test_get_node_status(server, mock_proxmox):
 @pytest.mark.asyncio
 async def test_get_vms(server, mock_proxmox):
     """Test get_vms tool."""
-    mock_proxmox.return_value.nodes.get.return_value = [{"node": "node1", "status": "online"}]
-    mock_proxmox.return_value.nodes.return_value.qemu.get.return_value = [
-        {"vmid": "100", "name": "vm1", "status": "running"},
-        {"vmid": "101", "name": "vm2", "status": "stopped"}
+    mock_proxmox.return_value.cluster.resources.get.return_value = [
+        {"vmid": "100", "name": "vm1", "status": "running", "node": "node1", "type": "qemu"},
+        {"vmid": "101", "name": "vm2", "status": "stopped", "node": "node1", "type": "qemu"},
+        {"vmid": "200", "name": "ct1", "status": "running", "node": "node1", "type": "lxc"}
     ]
 
     response = await server.mcp.call_tool("get_vms", {})
@@ -0,0 +1,309 @@
+"""
+Tests for the snapshot rotation script.
+"""
+
+import importlib.util
+import io
+import pathlib
+import threading
+from datetime import datetime, timedelta, UTC
+from unittest.mock import Mock, patch
+
+import pytest
+
+_SCRIPT = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "snapshot_rotate.py"
+_spec = importlib.util.spec_from_file_location("snapshot_rotate", _SCRIPT)
+snapshot_rotate = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(snapshot_rotate)
+
+NOW = datetime(2024, 6, 10, 12, 0, tzinfo=UTC)
+
+def task_api(statuses):
+    """Build a mock ProxmoxAPI whose task status reads return statuses in order."""
+    proxmox = Mock()
+    proxmox.nodes.return_value.tasks.return_value.status.get.side_effect = statuses
+    return proxmox
+
+def guest_api_mock(snapshots, exit_statuses=None):
+    """Build a mock ProxmoxAPI for one QEMU guest.
+
+    Creates return "UPID:create:<name>" and deletes "UPID:delete:<name>";
+    exit_statuses maps those UPIDs to the task's exit status (default "OK").
+    Submissions and task status reads are recorded in proxmox.events.
+    """
+    exit_statuses = exit_statuses or {}
+    proxmox = Mock()
+    proxmox.events = []
+
+    def submit(action, name):
+        proxmox.events.append((action, name))
+        return f"UPID:{action}:{name}"
+
+    def task_status(upid):
+        proxmox.events.append(("wait", upid))
+        return {"status": "stopped", "exitstatus": exit_statuses.get(upid, "OK")}
+
+    guest = proxmox.nodes.return_value.qemu.return_value
+    guest.snapshot.get.return_value = snapshots
+    guest.snapshot.post.side_effect = lambda snapname: submit("create", snapname)
+    guest.snapshot.side_effect = lambda name: Mock(
+        delete=Mock(side_effect=lambda: submit("delete", name))
+    )
+    proxmox.nodes.return_value.tasks.side_effect = lambda upid: Mock(
+        status=Mock(get=Mock(side_effect=lambda: task_status(upid)))
+    )
+    return proxmox
+
+def run_process_vm(proxmox, cadences, dry_run=False):
+    """Run process_vm for guest 104 on pve1 with the built-in retention."""
+    log = io.StringIO()
+    snapshot_rotate.process_vm(
+        ("qemu", "104", "pve1"),
+        proxmox,
+        NOW,
+        cadences,
+        snapshot_rotate.build_vm_cutoffs(NOW, {}),
+        dry_run,
+        log,
+        threading.Lock(),
+    )
+    return log.getvalue()
+
+def test_build_vm_cutoffs_layers_overrides():
+    """Test that per-vmid retention overrides layer over the default."""
+    config = {
+        "rotation": {
+            "retention": {
+                "default": {"daily": 7},
+                "per_vmid": {"100": {"hourly": 1}},
+            }
+        }
+    }
+
+    cutoffs = snapshot_rotate.build_vm_cutoffs(NOW, config)
+
+    assert set(cutoffs) == {"__default__", "100"}
+    assert cutoffs["__default__"]["daily"] == NOW - timedelta(days=7)
+    assert cutoffs["__default__"]["hourly"] == NOW - timedelta(days=3)
+    assert cutoffs["100"]["hourly"] == NOW - timedelta(days=1)
+    # Inherits the configured default, not the built-in one
+    assert cutoffs["100"]["daily"] == NOW - timedelta(days=7)
+    assert cutoffs["100"]["monthly"] == NOW - timedelta(days=730)
+
+def test_build_vm_cutoffs_without_rotation_section():
+    """Test that a config without rotation uses the built-in retention."""
+    cutoffs = snapshot_rotate.build_vm_cutoffs(NOW, {})
+
+    assert list(cutoffs) == ["__default__"]
+    assert cutoffs["__default__"]["weekly"] == NOW - timedelta(days=56)
+
+@pytest.mark.parametrize("retention", [
+    {"default": {"yearly": 3}},
+    {"per_vmid": {"100": {"hourly": 1, "minutely": 5}}},
+])
+def test_build_vm_cutoffs_rejects_unknown_cadences(retention):
+    """Test that unknown retention cadences are rejected."""
+    with pytest.raises(ValueError, match="Unknown cadences in retention"):
+        snapshot_rotate.build_vm_cutoffs(NOW, {"rotation": {"retention": retention}})
+
+@pytest.mark.parametrize("retention,message", [
+    ({"default": {"daily": "7"}}, "Invalid daily retention for __default__: '7'"),
+    ({"per_vmid": {"100": {"hourly": -1}}}, "Invalid hourly retention for 100: -1"),
+    ({"per_vmid": {"100": {"weekly": None}}}, "Invalid weekly retention for 100: None"),
+    ({"per_vmid": {"100": {"monthly": True}}}, "Invalid monthly retention for 100: True"),
+])
+def test_build_vm_cutoffs_rejects_invalid_days(retention, message):
+    """Test that retention values must be non-negative numbers."""
+    with pytest.raises(ValueError, match=message):
+        snapshot_rotate.build_vm_cutoffs(NOW, {"rotation": {"retention": retention}})
+
+def test_build_vm_cutoffs_accepts_fractional_days():
+    """Test that fractional and zero retention values are accepted."""
+    retention = {"per_vmid": {"100": {"hourly": 0.5, "daily": 0}}}
+
+    cutoffs = snapshot_rotate.build_vm_cutoffs(NOW, {"rotation": {"retention": retention}})
+
+    assert cutoffs["100"]["hourly"] == NOW - timedelta(hours=12)
+    assert cutoffs["100"]["daily"] == NOW
+
+def test_enabled_cadences():
+    """Test the enabled cadence set and its default."""
+    assert snapshot_rotate.enabled_cadences({}) == {"hourly", "daily", "weekly", "monthly"}
+    config = {"rotation": {"cadences": ["daily", "weekly"]}}
+    assert snapshot_rotate.enabled_cadences(config) == {"daily", "weekly"}
+
+def test_enabled_cadences_rejects_unknown():
+    """Test that unknown cadence names are rejected."""
+    with pytest.raises(ValueError, match="Unknown cadences in config: yearly"):
+        snapshot_rotate.enabled_cadences({"rotation": {"cadences": ["daily", "yearly"]}})
+
+@pytest.mark.parametrize("now,expected", [
+    (datetime(2024, 6, 10, 12, 30, tzinfo=UTC), ["hourly"]),
+    (datetime(2024, 6, 11, 12, 0, tzinfo=UTC), ["hourly", "daily"]),
+    # Monday at midnight
+    (datetime(2024, 6, 10, 0, 0, tzinfo=UTC), ["hourly", "daily", "weekly"]),
+    # First of the month, a Saturday
+    (datetime(2024, 6, 1, 0, 0, tzinfo=UTC), ["hourly", "daily", "monthly"]),
+    # First of the month and a Monday
+    (datetime(2024, 7, 1, 0, 0, tzinfo=UTC), ["hourly", "daily", "weekly", "monthly"]),
+])
+def test_should_create(now, expected):
+    """Test which cadences are due at a given time."""
+    enabled = frozenset(["hourly", "daily", "weekly", "monthly"])
+    assert snapshot_rotate.should_create(now, enabled) == expected
+
+def test_should_create_filters_disabled():
+    """Test that disabled cadences are never created."""
+    now = datetime(2024, 7, 1, 0, 0, tzinfo=UTC)
+    enabled = frozenset(["daily", "monthly"])
+    assert snapshot_rotate.should_create(now, enabled) == ["daily", "monthly"]
+
+def test_expired_snapshots():
+    """Test that only well-formed snapshots older than their cutoff expire."""
+    cutoffs = snapshot_rotate.retention_cutoffs(NOW, snapshot_rotate.DEFAULT_RETENTION_DAYS)
+    snapshots = [
+        {"name": "auto-hourly-20240601-1200"},
+        {"name": "auto-hourly-20240610-1100"},
+        {"name": "auto-daily-20240501"},
+        {"name": "auto-daily-20240609"},
+        {"name": "auto-weekly-20240101"},
+        {"name": "auto-monthly-20240101"},
+        {"name": "current"},
+        {"name": "manual-before-upgrade"},
+        {"description": "no name"},
+    ]
+
+    assert snapshot_rotate.expired_snapshots(snapshots, cutoffs) == [
+        "auto-hourly-20240601-1200",
+        "auto-daily-20240501",
+        "auto-weekly-20240101",
+    ]
+
+@pytest.mark.parametrize("name", [
+    # Hourly without a time, and non-hourly with one
+    "auto-hourly-20240101",
+    "auto-daily-20240101-1200",
+    # Out-of-range date or time
+    "auto-hourly-20240101-2500",
+    "auto-daily-20241301",
+])
+def test_expired_snapshots_skips_malformed_stamps(name):
+    """Test that malformed stamps are never treated as expired."""
+    cutoffs = snapshot_rotate.retention_cutoffs(NOW, snapshot_rotate.DEFAULT_RETENTION_DAYS)
+
+    assert snapshot_rotate.parse_snapshot_timestamp(name) is None
+    assert snapshot_rotate.expired_snapshots([{"name": name}], cutoffs) == []
+
+def test_wait_for_task_reports_exit_status():
+    """Test that a finished task reports its exit status."""
+    proxmox = task_api([
+        {"status": "running"},
+        {"status": "stopped", "exitstatus": "OK"},
+    ])
+
+    with patch.object(snapshot_rotate.time, "sleep") as sleep:
+        status = snapshot_rotate.wait_for_task(proxmox, "pve1", "UPID:1")
+
+    assert status == "OK"
+    sleep.assert_called_once_with(0.5)
+    proxmox.nodes.assert_called_with("pve1")
+    proxmox.nodes.return_value.tasks.assert_called_with("UPID:1")
+
+def test_wait_for_task_reports_failure():
+    """Test that a failed task reports its error exit status."""
+    proxmox = task_api([{"status": "stopped", "exitstatus": "snapshot 'x' does not exist"}])
+
+    status = snapshot_rotate.wait_for_task(proxmox, "pve1", "UPID:1")
+
+    assert status == "snapshot 'x' does not exist"
+
+def test_wait_for_task_times_out():
+    """Test that a task still running at the deadline reports a timeout."""
+    proxmox = task_api([{"status": "running"}] * 3)
+
+    with patch.object(snapshot_rotate.time, "monotonic", side_effect=[0.0, 5.0, 11.0]), \
+         patch.object(snapshot_rotate.time, "sleep") as sleep:
+        status = snapshot_rotate.wait_for_task(proxmox, "pve1", "UPID:1", timeout=10.0)
+
+    assert status == "timeout"
+    assert [call.args[0] for call in sleep.call_args_list] == [0.5]
+
+def test_process_vm_prunes_after_failed_create():
+    """Test that a failed create still lets the other cadences and the prune run."""
+    proxmox = guest_api_mock(
+        [{"name": "auto-hourly-20200101-0000"}, {"name": "current"}],
+        {"UPID:create:auto-hourly-20240610-1200": "storage full"},
+    )
+    guest = proxmox.nodes.return_value.qemu.return_value
+
+    with pytest.raises(RuntimeError, match="auto-hourly-20240610-1200 failed: storage full"):
+        run_process_vm(proxmox, ["hourly", "daily"])
+
+    assert [c.kwargs["snapname"] for c in guest.snapshot.post.call_args_list] == [
+        "auto-hourly-20240610-1200",
+        "auto-daily-20240610",
+    ]
+    guest.snapshot.assert_called_once_with("auto-hourly-20200101-0000")
+
+def test_process_vm_skips_existing_and_prunes_one_at_a_time():
+    """Test that existing names are not re-created and deletes run sequentially."""
+    proxmox = guest_api_mock([
+        {"name": "auto-hourly-20240610-1200"},
+        {"name": "auto-hourly-20200101-0000"},
+        {"name": "auto-daily-20200101"},
+        {"name": "auto-daily-20240609"},
+        {"name": "current"},
+    ])
+
+    log = run_process_vm(proxmox, ["hourly", "daily"])
+
+    assert proxmox.events == [
+        ("create", "auto-daily-20240610"),
+        ("wait", "UPID:create:auto-daily-20240610"),
+        ("delete", "auto-hourly-20200101-0000"),
+        ("wait", "UPID:delete:auto-hourly-20200101-0000"),
+        ("delete", "auto-daily-20200101"),
+        ("wait", "UPID:delete:auto-daily-20200101"),
+    ]
+    assert log == "created qemu 104 daily\n"
+
+def test_process_vm_dry_run_sends_nothing(capsys):
+    """Test that a dry run only reports what it would do."""
+    proxmox = guest_api_mock([{"name": "auto-hourly-20200101-0000"}])
+
+    run_process_vm(proxmox, ["hourly"], dry_run=True)
+
+    assert proxmox.events == []
+    assert capsys.readouterr().out.splitlines() == [
+        "[dry-run] create qemu 104@auto-hourly-20240610-1200",
+        "[dry-run] delete qemu 104@auto-hourly-20200101-0000",
+    ]
+
+def test_main_rotates_supported_guests(tmp_path, capsys):
+    """Test that main() skips templates and unsupported guest types."""
+    config = tmp_path / "config.json"
+    config.write_text("{}")
+    log = tmp_path / "logs" / "rotate.log"
+    proxmox = Mock()
+    proxmox.cluster.resources.get.return_value = [
+        {"vmid": 100, "node": "pve1", "type": "qemu"},
+        {"vmid": 101, "node": "pve1"},
+        {"vmid": 200, "node": "pve2", "type": "lxc"},
+        {"vmid": 300, "node": "pve1", "type": "qemu", "template": 1},
+        {"vmid": 400, "type": "qemu"},
+        {"vmid": 500, "node": "pve1", "type": "openvz"},
+    ]
+    argv = ["snapshot_rotate", "--config", str(config), "--log-file", str(log), "--workers", "1"]
+
+    with patch.object(snapshot_rotate, "connect_proxmox", return_value=proxmox), \
+         patch.object(snapshot_rotate, "process_vm") as process_vm, \
+         patch.object(snapshot_rotate.sys, "argv", argv):
+        assert snapshot_rotate.main() == 0
+
+    assert [c.args[0] for c in process_vm.call_args_list] == [
+        ("qemu", "100", "pve1"),
+        ("qemu", "101", "pve1"),
+        ("lxc", "200", "pve2"),
+    ]
+    assert "skipping unsupported type openvz vmid 500" in capsys.readouterr().out
+    assert "skipping unsupported type openvz vmid 500" in log.read_text()
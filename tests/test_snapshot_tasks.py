@@ -0,0 +1,213 @@
+"""
+Tests for snapshot tasks over the async Proxmox client.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from proxmox_mcp.config.models import AuthConfig, ProxmoxConfig
+from proxmox_mcp.tools.base import ProxmoxAPIError, ProxmoxAsyncClient
+from proxmox_mcp.tools.vm import VMTools
+
+_sleep = asyncio.sleep
+
+async def no_delay(delay):
+    """Stand-in for asyncio.sleep that only yields to the event loop."""
+    await _sleep(0)
+
+class FakeProxmox:
+    """Minimal Proxmox task API: snapshot POSTs start tasks that stop after a few polls."""
+
+    def __init__(self, polls=2, exitstatus="OK"):
+        self.polls = polls
+        self.exitstatus = exitstatus
+        self.events = []
+        self._remaining = {}
+
+    def __call__(self, request):
+        path = request.url.path.removeprefix("/api2/json")
+        if request.method == "POST" and path.endswith("/snapshot"):
+            upid = f"UPID:pve1:{len(self._remaining)}"
+            self._remaining[upid] = self.polls
+            self.events.append(("submit", upid))
+            return httpx.Response(200, json={"data": upid})
+        if path.endswith("/status"):
+            upid = path.split("/")[-2]
+            self._remaining[upid] -= 1
+            if self._remaining[upid] > 0:
+                return httpx.Response(200, json={"data": {"status": "running"}})
+            self.events.append(("stopped", upid))
+            return httpx.Response(
+                200, json={"data": {"status": "stopped", "exitstatus": self.exitstatus}}
+            )
+        return httpx.Response(404)
+
+def make_client(handler):
+    """Create a ProxmoxAsyncClient whose requests go to handler."""
+    client = ProxmoxAsyncClient(
+        ProxmoxConfig(host="pve.example"),
+        AuthConfig(user="root@pam", token_name="mcp", token_value="secret"),
+    )
+    client._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler),
+        base_url="https://pve.example:8006/api2/json",
+    )
+    return client
+
+@pytest.fixture(autouse=True)
+def fast_sleep():
+    """Fixture to skip the task polling delays."""
+    with patch("proxmox_mcp.tools.base.asyncio.sleep", new=no_delay):
+        yield
+
+@pytest.fixture
+def vm_tools():
+    """Fixture to create VMTools whose async client talks to a FakeProxmox."""
+    tools = VMTools(
+        None,
+        ProxmoxConfig(host="pve.example"),
+        AuthConfig(user="root@pam", token_name="mcp", token_value="secret"),
+    )
+    tools.fake = FakeProxmox()
+    tools._client = make_client(tools.fake)
+    return tools
+
+@pytest.mark.asyncio
+async def test_request_unwraps_data():
+    """Test that responses are unwrapped to their data member."""
+    client = make_client(lambda request: httpx.Response(200, json={"data": [{"name": "s1"}]}))
+
+    assert await client.get("/nodes/pve1/qemu/100/snapshot") == [{"name": "s1"}]
+
+@pytest.mark.asyncio
+async def test_request_error_surfaces_reason():
+    """Test that Proxmox's reason phrase and error details reach the exception."""
+    reason = b"Configuration file 'nodes/pve1/qemu-server/100.conf' does not exist"
+
+    def handler(request):
+        return httpx.Response(500, json={"data": None}, extensions={"reason_phrase": reason})
+
+    with pytest.raises(ProxmoxAPIError, match="does not exist") as exc_info:
+        await make_client(handler).get("/nodes/pve1/qemu/100/snapshot")
+
+    assert exc_info.value.status_code == 500
+
+@pytest.mark.asyncio
+async def test_request_error_includes_parameter_errors():
+    """Test that per-parameter validation errors are included."""
+    def handler(request):
+        return httpx.Response(
+            400,
+            json={"data": None, "errors": {"snapname": "invalid format"}},
+            extensions={"reason_phrase": b"Parameter verification failed."},
+        )
+
+    with pytest.raises(ProxmoxAPIError, match="snapname.*invalid format"):
+        await make_client(handler).post("/nodes/pve1/qemu/100/snapshot", snapname="a b")
+
+@pytest.mark.asyncio
+async def test_wait_for_task_returns_exit_status():
+    """Test that wait_for_task polls until the task stops."""
+    fake = FakeProxmox(polls=3, exitstatus="OK")
+    client = make_client(fake)
+    upid = await client.post("/nodes/pve1/qemu/100/snapshot", snapname="s1")
+
+    assert await client.wait_for_task("pve1", upid) == "OK"
+    assert fake.events[-1] == ("stopped", upid)
+
+@pytest.mark.asyncio
+async def test_wait_for_task_times_out():
+    """Test that a task still running at the deadline reports a timeout."""
+    client = make_client(FakeProxmox(polls=1000))
+    upid = await client.post("/nodes/pve1/qemu/100/snapshot", snapname="s1")
+
+    assert await client.wait_for_task("pve1", upid, timeout=0) == "timeout"
+
+@pytest.mark.asyncio
+async def test_concurrent_snapshots_on_one_guest_are_serialized(vm_tools):
+    """Test that a second task on a guest is not submitted until the first stops."""
+    await asyncio.gather(
+        vm_tools.create_snapshot("pve1", "100", "s1"),
+        vm_tools.create_snapshot("pve1", "100", "s2"),
+    )
+
+    assert [event for event, _ in vm_tools.fake.events] == [
+        "submit", "stopped", "submit", "stopped",
+    ]
+
+@pytest.mark.asyncio
+async def test_snapshots_on_different_guests_overlap(vm_tools):
+    """Test that the lock is per guest."""
+    await asyncio.gather(
+        vm_tools.create_snapshot("pve1", "100", "s1"),
+        vm_tools.create_snapshot("pve1", "101", "s1"),
+    )
+
+    assert [event for event, _ in vm_tools.fake.events][:2] == ["submit", "submit"]
+
+@pytest.mark.asyncio
+async def test_failed_task_raises(vm_tools):
+    """Test that a non-OK exit status is reported as an error."""
+    vm_tools.fake.exitstatus = "snapshot feature is not available"
+
+    with pytest.raises(RuntimeError, match="snapshot feature is not available"):
+        await vm_tools.create_snapshot("pve1", "100", "s1")
+    assert not vm_tools._vm_locks["100"].locked()
+
+@pytest.mark.asyncio
+async def test_timed_out_task_keeps_guest_locked(vm_tools):
+    """Test that a task outliving its call holds the lock until it stops."""
+    stopped = asyncio.Event()
+
+    async def wait_for_task(node, upid):
+        if not stopped.is_set() and not vm_tools._pending_tasks:
+            return "timeout"
+        await stopped.wait()
+        return "OK"
+
+    vm_tools._client = AsyncMock()
+    vm_tools._client.post.return_value = "UPID:pve1:0"
+    vm_tools._client.wait_for_task.side_effect = wait_for_task
+
+    response = await vm_tools.create_snapshot("pve1", "100", "s1", include_memory=True)
+
+    assert "UPID:pve1:0 is still running" in response[0].text
+    assert vm_tools._vm_locks["100"].locked()
+    stopped.set()
+    await asyncio.gather(*vm_tools._pending_tasks)
+    assert not vm_tools._vm_locks["100"].locked()
+
+@pytest.mark.asyncio
+async def test_aclose_closes_client(vm_tools):
+    """Test that aclose closes the pooled connections."""
+    http = vm_tools._client._client
+
+    await vm_tools.aclose()
+
+    assert http.is_closed
+    assert "_client" not in vm_tools.__dict__
+
+@pytest.mark.asyncio
+async def test_aclose_cancels_pending_waiters(vm_tools):
+    """Test that shutdown stops waiters for tasks that outlived their call."""
+    never = asyncio.Event()
+
+    async def wait_for_task(node, upid):
+        if not vm_tools._pending_tasks:
+            return "timeout"
+        await never.wait()
+
+    vm_tools._client = AsyncMock()
+    vm_tools._client.post.return_value = "UPID:pve1:0"
+    vm_tools._client.wait_for_task.side_effect = wait_for_task
+
+    await vm_tools.create_snapshot("pve1", "100", "s1")
+    assert vm_tools._pending_tasks
+
+    await vm_tools.aclose()
+
+    assert not vm_tools._pending_tasks
+    assert not vm_tools._vm_locks["100"].locked()
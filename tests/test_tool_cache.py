@@ -0,0 +1,233 @@
+"""
+Tests for the ProxmoxTool read cache and its stale-while-error fallback.
+"""
+
+import httpx
+import pytest
+import requests
+from unittest.mock import AsyncMock, Mock, patch
+
+from proxmoxer.core import ResourceException
+
+from proxmox_mcp.config.models import AuthConfig, ProxmoxConfig
+from proxmox_mcp.tools.base import (
+    CACHE_STALE_MAX_AGE,
+    CACHE_TTL_NORMAL,
+    ProxmoxAPIError,
+    ProxmoxTool,
+)
+from proxmox_mcp.tools.node import NodeTools
+from proxmox_mcp.tools.vm import VMTools
+
+KEY = ("nodes/pve1/qemu/100/snapshot", ())
+
+@pytest.fixture
+def tool():
+    """Fixture to create a ProxmoxTool around a mock API."""
+    return ProxmoxTool(Mock())
+
+@pytest.fixture
+def vm_tools():
+    """Fixture to create VMTools with a mock API and async client."""
+    tools = VMTools(
+        Mock(),
+        ProxmoxConfig(host="pve.example"),
+        AuthConfig(user="root@pam", token_name="mcp", token_value="secret"),
+    )
+    tools._client = AsyncMock()
+    return tools
+
+def expire(tool):
+    """Simulate TTL expiry of every fresh cache entry."""
+    for cache in tool._caches.values():
+        cache.clear()
+
+def test_cached_serves_repeated_reads_from_memory(tool):
+    """Test that a second read within the TTL does not call the API."""
+    fn = Mock(return_value=[{"name": "snap1"}])
+
+    assert tool._cached(KEY, fn) == [{"name": "snap1"}]
+    assert tool._cached(KEY, fn) == [{"name": "snap1"}]
+    fn.assert_called_once()
+
+def test_cached_falls_back_to_stale_data(tool):
+    """Test that a failed refresh returns the last result, marked stale."""
+    tool._cached(KEY, Mock(return_value=[{"name": "snap1"}, "raw"]))
+    expire(tool)
+
+    result = tool._cached(KEY, Mock(side_effect=httpx.ConnectError("connection refused")))
+
+    assert result[0]["name"] == "snap1"
+    assert result[0]["_stale"] is True
+    assert tool._stale_as_of(result) == result[0]["_as_of"]
+    assert result[1] == "raw"
+    # The stored copy is not modified by the annotation
+    assert tool._cached(KEY, Mock(side_effect=httpx.ConnectError("down")))[0]["name"] == "snap1"
+    assert "_stale" not in tool._stale_cache[KEY][0][0]
+
+def test_cached_fallback_annotates_dict(tool):
+    """Test that a stale dict result carries the marker too."""
+    tool._cached(KEY, Mock(return_value={"status": "running"}))
+    expire(tool)
+
+    result = tool._cached(KEY, Mock(side_effect=httpx.ConnectError("down")))
+
+    assert result["status"] == "running"
+    assert result["_stale"] is True
+    assert "_as_of" in result
+
+@pytest.mark.parametrize("error", [
+    httpx.ConnectTimeout("timed out"),
+    requests.exceptions.ConnectionError("refused"),
+    requests.exceptions.RetryError("too many 503 error responses"),
+    ProxmoxAPIError(503, "Service Unavailable"),
+    ResourceException(502, "Bad Gateway", ""),
+])
+def test_cached_falls_back_on_outages(tool, error):
+    """Test that unreachable-API failures are served from the stale copy."""
+    tool._cached(KEY, Mock(return_value=[{"name": "snap1"}]))
+    expire(tool)
+
+    assert tool._cached(KEY, Mock(side_effect=error))[0]["_stale"] is True
+
+@pytest.mark.parametrize("error", [
+    ProxmoxAPIError(500, "Configuration file 'nodes/pve1/qemu-server/100.conf' does not exist"),
+    ProxmoxAPIError(401, "authentication failure"),
+    ResourceException(403, "Forbidden", "Permission check failed"),
+    ValueError("bad response"),
+])
+def test_cached_raises_api_errors_despite_stale_copy(tool, error):
+    """Test that answers from Proxmox are never masked by cached data."""
+    tool._cached(KEY, Mock(return_value=[{"name": "snap1"}]))
+    expire(tool)
+
+    with pytest.raises(type(error)):
+        tool._cached(KEY, Mock(side_effect=error))
+
+def test_cached_does_not_serve_entries_past_max_age(tool):
+    """Test that the stale copy is only served up to CACHE_STALE_MAX_AGE."""
+    with patch("proxmox_mcp.tools.base.time.time", return_value=1000.0):
+        tool._cached(KEY, Mock(return_value=[{"name": "snap1"}]))
+    expire(tool)
+
+    with patch("proxmox_mcp.tools.base.time.time", return_value=1000.0 + CACHE_STALE_MAX_AGE):
+        assert tool._cached(KEY, Mock(side_effect=httpx.ConnectError("down")))[0]["_stale"]
+    with patch("proxmox_mcp.tools.base.time.time", return_value=1001.0 + CACHE_STALE_MAX_AGE):
+        with pytest.raises(httpx.ConnectError):
+            tool._cached(KEY, Mock(side_effect=httpx.ConnectError("down")))
+
+def test_cached_raises_without_previous_result(tool):
+    """Test that a failure with nothing cached is re-raised."""
+    with pytest.raises(httpx.ConnectError, match="down"):
+        tool._cached(KEY, Mock(side_effect=httpx.ConnectError("down")))
+
+def test_cached_fallback_disabled_per_call(tool):
+    """Test that fallback=False re-raises instead of serving stale data."""
+    tool._cached(KEY, Mock(return_value=[{"name": "snap1"}]))
+    expire(tool)
+
+    with pytest.raises(httpx.ConnectError, match="down"):
+        tool._cached(KEY, Mock(side_effect=httpx.ConnectError("down")), fallback=False)
+
+def test_cached_fallback_disabled_on_tool(tool):
+    """Test that cache_fallback_enabled=False re-raises."""
+    tool.cache_fallback_enabled = False
+    tool._cached(KEY, Mock(return_value=[{"name": "snap1"}]))
+    expire(tool)
+
+    with pytest.raises(httpx.ConnectError, match="down"):
+        tool._cached(KEY, Mock(side_effect=httpx.ConnectError("down")))
+
+def test_invalidate_drops_fresh_and_stale_entries(tool):
+    """Test that invalidation removes both the TTL and the stale entry."""
+    other = ("nodes/pve1/qemu/101/snapshot", ())
+    tool._cached(KEY, Mock(return_value=[{"name": "snap1"}]))
+    tool._cached(other, Mock(return_value=[{"name": "snap2"}]))
+
+    tool._invalidate("nodes/pve1/qemu/100/")
+
+    assert KEY not in tool._stale_cache
+    assert other in tool._stale_cache
+    with pytest.raises(httpx.ConnectError, match="down"):
+        tool._cached(KEY, Mock(side_effect=httpx.ConnectError("down")))
+    assert tool._cached(other, Mock(side_effect=httpx.ConnectError("down")))[0]["name"] == "snap2"
+
+@pytest.mark.asyncio
+async def test_acached_falls_back_to_stale_data(tool):
+    """Test the stale fallback for coroutine-based reads."""
+    await tool._acached(KEY, AsyncMock(return_value=[{"name": "snap1"}]), CACHE_TTL_NORMAL)
+    expire(tool)
+
+    failing = AsyncMock(side_effect=httpx.ConnectError("down"))
+    result = await tool._acached(KEY, failing, CACHE_TTL_NORMAL)
+
+    assert result[0]["_stale"] is True
+    with pytest.raises(httpx.ConnectError, match="down"):
+        await tool._acached(KEY, failing, CACHE_TTL_NORMAL, fallback=False)
+
+def test_get_vms_lists_qemu_guests_only(vm_tools):
+    """Test that get_vms uses cluster/resources and skips containers."""
+    vm_tools.proxmox.cluster.resources.get.return_value = [
+        {"vmid": 100, "name": "vm1", "status": "running", "node": "pve1", "type": "qemu"},
+        {"vmid": 200, "name": "ct1", "status": "running", "node": "pve1", "type": "lxc"},
+    ]
+
+    response = vm_tools.get_vms()
+
+    assert len(response) == 1
+    assert "vm1" in response[0].text
+    assert "ct1" not in response[0].text
+    vm_tools.proxmox.cluster.resources.get.assert_called_once_with(type="vm")
+
+def test_get_vms_notes_stale_data(vm_tools):
+    """Test that get_vms appends a note when serving stale data."""
+    vm_tools.proxmox.cluster.resources.get.return_value = [
+        {"vmid": 100, "name": "vm1", "status": "running", "node": "pve1", "type": "qemu"},
+    ]
+    vm_tools.get_vms()
+    expire(vm_tools)
+    vm_tools.proxmox.cluster.resources.get.side_effect = httpx.ConnectError("down")
+
+    response = vm_tools.get_vms()
+
+    assert "vm1" in response[0].text
+    assert "showing cached data from" in response[-1].text
+
+@pytest.mark.asyncio
+async def test_list_snapshots_notes_stale_data(vm_tools):
+    """Test that list_snapshots marks stale output and fresh output is unmarked."""
+    vm_tools._client.get.return_value = [{"name": "snap1", "snaptime": 1700000000}]
+    fresh = await vm_tools.list_snapshots("pve1", "100")
+    expire(vm_tools)
+    vm_tools._client.get.side_effect = httpx.ConnectError("down")
+
+    stale = await vm_tools.list_snapshots("pve1", "100")
+
+    assert "cached data" not in fresh[0].text
+    assert "showing cached data from" in stale[0].text
+    assert "- snap1 (created: " in stale[0].text
+
+@pytest.mark.asyncio
+async def test_list_snapshots_reports_missing_guest(vm_tools):
+    """Test that a Proxmox error is reported even when a listing is cached."""
+    vm_tools._client.get.return_value = [{"name": "snap1", "snaptime": 1700000000}]
+    await vm_tools.list_snapshots("pve1", "100")
+    expire(vm_tools)
+    vm_tools._client.get.side_effect = ProxmoxAPIError(
+        500, "Configuration file 'nodes/pve1/qemu-server/100.conf' does not exist"
+    )
+
+    with pytest.raises(RuntimeError, match="does not exist"):
+        await vm_tools.list_snapshots("pve1", "100")
+
+def test_get_nodes_does_not_serve_stale_data():
+    """Test that get_nodes reports an outage instead of a cached node list."""
+    tools = NodeTools(Mock())
+    tools.proxmox.nodes.get.return_value = [{"node": "pve1", "status": "online"}]
+    tools.proxmox.nodes.return_value.status.get.return_value = {"uptime": 60}
+    tools.get_nodes()
+    expire(tools)
+    tools.proxmox.nodes.get.side_effect = requests.exceptions.ConnectionError("down")
+
+    with pytest.raises(RuntimeError):
+        tools.get_nodes()